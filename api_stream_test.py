@@ -16,8 +16,12 @@ async def test_stream():
             # Send a few frames
             for _ in range(5):
                 await websocket.send(silent_frame)
-                response = await websocket.recv()
-                print(f"Received: {response}")
+                # The server only replies when there is something new, and never for silence
+                try:
+                    response = await asyncio.wait_for(websocket.recv(), timeout=1.0)
+                    print(f"Received: {response}")
+                except asyncio.TimeoutError:
+                    print("No response (expected for silence)")
                 time.sleep(0.1)  # Small delay between frames
                 
     except websockets.exceptions.ConnectionClosed as e:
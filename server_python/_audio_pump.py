@@ -0,0 +1,53 @@
+import asyncio
+import struct
+
+import websockets
+
+
+async def pump_audio(websocket, recorder, *, stop_event: asyncio.Event, batch_frames: int = 4):
+    """Send microphone audio to the server until stop_event is set.
+
+    Frames are packed as int16 PCM straight into one reusable buffer and sent
+    batch_frames at a time to cut per-message overhead.
+    """
+    frame = struct.Struct(f'{recorder.frame_length}h')
+    buffer = bytearray(frame.size * batch_frames)
+    while not stop_event.is_set():
+        for i in range(batch_frames):
+            # Read audio frame from microphone (blocking, so off the event loop)
+            read = asyncio.ensure_future(asyncio.to_thread(recorder.read))
+            try:
+                pcm_frame = await asyncio.shield(read)
+            except asyncio.CancelledError:
+                # The worker thread can't be interrupted; let it finish so the caller
+                # never stops or deletes the recorder while a read is still using it
+                await asyncio.wait([read])
+                raise
+            frame.pack_into(buffer, i * frame.size, *pcm_frame)
+
+        # The receiver may have finished while this batch was being recorded
+        if stop_event.is_set():
+            break
+        try:
+            await websocket.send(bytes(buffer))
+        except websockets.exceptions.ConnectionClosedOK:
+            # The server closed normally, e.g. once enrollment completed
+            break
+
+
+async def stream_audio(websocket, recorder, receive, *, stop_event: asyncio.Event, batch_frames: int = 4):
+    """Run pump_audio alongside the receive coroutine, returning only once the pump has stopped.
+
+    gather() gives up as soon as either side fails or is cancelled (e.g. on Ctrl+C),
+    which would let the caller stop and delete the recorder while a read is still in flight.
+    """
+    pump = asyncio.ensure_future(
+        pump_audio(websocket, recorder, stop_event=stop_event, batch_frames=batch_frames)
+    )
+    try:
+        await asyncio.gather(pump, receive)
+    finally:
+        # A cancelled gather() has already cancelled the pump, and cancelling it again would
+        # interrupt its wait for the in-flight read; otherwise it exits after the current batch
+        stop_event.set()
+        await asyncio.wait([pump])
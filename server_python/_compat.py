@@ -0,0 +1,23 @@
+import asyncio
+import json
+
+try:
+    import orjson  # Faster JSON codec; falls back to the stdlib json module if missing
+
+    def dumps(obj) -> str:
+        # Keep JSON on text frames, as with stdlib json
+        return orjson.dumps(obj).decode()
+
+    loads = orjson.loads
+except ImportError:
+    dumps = json.dumps
+    loads = json.loads
+
+
+def use_uvloop() -> None:
+    """Run asyncio.run on uvloop when it is installed; it is not available on Windows"""
+    try:
+        import uvloop
+    except ImportError:
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
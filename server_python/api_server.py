@@ -3,16 +3,48 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import asyncio
 import json
+import logging
 import os
-from typing import Optional, Dict, List
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Optional, Dict, List, Tuple
 import numpy as np
 import pveagle
 import pvcheetah
-import struct
+import orjson
+import msgpack
 from pydantic import BaseModel
 from fastapi import WebSocketDisconnect
 
+logger = logging.getLogger(__name__)
+
+# Set VALIDATE_STREAM_RESPONSES=1 to check streamed results against TranscriptionResponse (debug only)
+VALIDATE_STREAM_RESPONSES = os.getenv("VALIDATE_STREAM_RESPONSES") == "1"
+# Results carrying only speaker scores are coalesced; at most one in this many is sent
+SCORE_UPDATE_INTERVAL = int(os.getenv("SCORE_UPDATE_INTERVAL", "4"))
+# Concurrent /stream connections per worker; each one holds a Cheetah and an Eagle instance
+STREAM_POOL_SIZE = int(os.getenv("STREAM_POOL_SIZE", "2"))
+# Eagle profilers kept ready for /enroll; concurrent enrollments beyond this get a temporary one
+PROFILER_POOL_SIZE = int(os.getenv("PROFILER_POOL_SIZE", "1"))
+# Frames (32 ms each) a stream may fall behind before queued audio is dropped to catch up;
+# at least 1, since 0 would drop every frame
+STREAM_MAX_BACKLOG = max(1, int(os.getenv("STREAM_MAX_BACKLOG", "16")))
+# Minimum enrollment progress change (in percent) before another progress message is sent
+PROGRESS_UPDATE_STEP = 5.0
+# Frames whose peak amplitude is below this skip Eagle; 0 disables the silence gate
+SILENCE_THRESHOLD = int(os.getenv("SILENCE_THRESHOLD", "100"))
+# After this many consecutive silent frames (32 ms each) Cheetah is flushed and skipped until speech resumes;
+# 0 or less never pauses it
+SILENCE_FLUSH_FRAMES = int(os.getenv("SILENCE_FLUSH_FRAMES", "32"))
+# Per-frame engine errors are logged once per this many occurrences on a stream
+FRAME_ERROR_LOG_INTERVAL = 100
+# Seconds a new /stream connection waits for free engines before being told to retry (close code 1013)
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("POOL_ACQUIRE_TIMEOUT", "5"))
+
 class TranscriptionResponse(BaseModel):
+    """Schema of the results sent on /stream"""
     transcript: str
     speaker_scores: Dict[str, float]
     most_likely_speaker: str
@@ -36,186 +68,496 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def configure_logging() -> QueueListener:
+    """Route this module's log records through a queue so the event loop never blocks on stderr"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.handlers = [QueueHandler(log_queue)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+async def send_json(websocket: WebSocket, data: Any) -> None:
+    """Send a JSON text frame encoded with orjson, which also handles numpy arrays and enums"""
+    await websocket.send_text(orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode())
+
+async def send_msgpack(websocket: WebSocket, data: Any) -> None:
+    """Send a binary MessagePack frame, for clients that negotiated the "msgpack" subprotocol"""
+    await websocket.send_bytes(msgpack.packb(data, use_bin_type=True))
+
+MessageSender = Callable[[WebSocket, Any], Awaitable[None]]
+
 # Add WebSocket exception handler
 @app.exception_handler(WebSocketDisconnect)
 async def websocket_disconnect_handler(request: Request, exc: WebSocketDisconnect):
-    print(f"WebSocket client disconnected with code: {exc.code}")
+    logger.info("WebSocket client disconnected with code: %s", exc.code)
     return None
 
+class EnginePool:
+    """Fixed-size pool of Picovoice engine instances reused across connections"""
+
+    def __init__(self, factory: Callable[[], Any], size: int, reset: Optional[Callable[[Any], None]] = None):
+        self._factory = factory
+        self._reset = reset
+        self._size = size
+        self._created = 0
+        self._idle = asyncio.LifoQueue()
+        # Tasks in acquire() waiting for an engine to be released or for capacity to free up
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Engines built before the last invalidate() are retired instead of reused
+        self._generation = 0
+        self._generation_of: Dict[int, int] = {}
+
+    async def fill(self) -> None:
+        """Create the remaining engines up front, off the event loop"""
+        while self._created < self._size:
+            engine = await self._create()
+            if self._is_current(engine):
+                self._idle.put_nowait(engine)
+            else:
+                self._discard(engine)
+
+    async def _create(self) -> Any:
+        self._created += 1
+        generation = self._generation
+        try:
+            engine = await asyncio.to_thread(self._factory)
+        except Exception:
+            self._created -= 1
+            raise
+        self._generation_of[id(engine)] = generation
+        return engine
+
+    def _is_current(self, engine: Any) -> bool:
+        # Checked after every thread hop: invalidate() may have run while the engine was being built or reset
+        return self._generation_of.get(id(engine)) == self._generation
+
+    def _discard(self, engine: Any) -> None:
+        self._generation_of.pop(id(engine), None)
+        engine.delete()
+        self._created -= 1
+        self._wake_one()  # A waiter can now create a replacement
+
+    def _wake_one(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Take an idle engine, creating one if the pool is not full yet, else wait for a release
+
+        Raises asyncio.TimeoutError if no engine frees up within `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            if not self._idle.empty():
+                return self._idle.get_nowait()
+            if self._created < self._size:
+                engine = await self._create()
+                if self._is_current(engine):
+                    return engine
+                self._discard(engine)  # Built from inputs that changed meanwhile; try again
+                continue
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, None if deadline is None else max(0.0, deadline - loop.time()))
+            except BaseException:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake_one()  # Pass on a wakeup this task can no longer use
+                raise
+
+    async def release(self, engine: Any, discard: bool = False) -> None:
+        """Reset an engine and return it to the pool; stale, broken (`discard`) and failed-reset engines are dropped"""
+        if discard or not self._is_current(engine):
+            self._discard(engine)
+            return
+        try:
+            if self._reset:
+                await asyncio.to_thread(self._reset, engine)
+        except Exception as e:
+            logger.warning("Discarding pooled engine after failed reset: %s", e)
+            self._discard(engine)
+            return
+        if not self._is_current(engine):
+            self._discard(engine)  # Invalidated while the reset was running
+            return
+        self._idle.put_nowait(engine)
+        self._wake_one()
+
+    def invalidate(self) -> None:
+        """Drop idle engines and retire in-use ones on release, e.g. after the inputs to the factory change"""
+        self._generation += 1
+        self.close()
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._discard(self._idle.get_nowait())
+
+class StreamSession:
+    """Engines borrowed from the pools for one /stream connection"""
+
+    def __init__(self, cheetah: pvcheetah.Cheetah, eagle: Optional[pveagle.Eagle],
+                 speaker_labels: Tuple[str, ...]):
+        self.cheetah = cheetah
+        self.eagle = eagle
+        # Taken together with the eagle: every profile change invalidates the pool, and the pool only
+        # hands out current-generation recognizers, so these labels line up with its scores
+        self.speaker_labels = speaker_labels
+        self._frame_errors = 0
+        self._silent_frames = 0  # Consecutive frames below SILENCE_THRESHOLD
+        # Set when an engine fails and cannot be recovered; it is skipped and discarded on release
+        self.eagle_broken = False
+        self.cheetah_broken = False
+        # Cheetah is stateful, so frames go through a single-worker executor to keep them in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+
+    def _log_frame_error(self, stage: str, error: Exception) -> None:
+        # Rate-limited: a broken stream can fail on every frame
+        self._frame_errors += 1
+        if self._frame_errors % FRAME_ERROR_LOG_INTERVAL == 1:
+            logger.error("%s error (%d on this stream so far): %s", stage, self._frame_errors, error)
+
+    def _process_frame_sync(self, frame_data: bytes) -> Optional[dict]:
+        """Run Eagle and Cheetah on a single frame; blocking, call from the session executor"""
+        # View bytes as 16-bit PCM without copying
+        pcm = np.frombuffer(frame_data, dtype=np.int16)
+        
+        if pcm.size != 512:  # Ensure frame size is correct
+            return None
+
+        # Cheap energy gate: peak amplitude, without allocating an abs() temporary
+        if max(int(pcm.max()), -int(pcm.min())) < SILENCE_THRESHOLD:
+            self._silent_frames += 1
+        else:
+            self._silent_frames = 0
+
+        # The pv* bindings copy input into a ctypes array element by element, which is
+        # much cheaper from a list of ints than from numpy scalars; convert once for both engines.
+        # Long pauses feed neither engine, so they skip the conversion.
+        cheetah_paused = 0 < SILENCE_FLUSH_FRAMES <= self._silent_frames
+        samples = None if cheetah_paused else pcm.tolist()
+
+        # Process speaker identification
+        speaker_scores = {}
+        most_likely_speaker = "Unknown"
+        
+        # Silence carries no speaker information, so Eagle is skipped for it
+        if self.eagle and not self.eagle_broken and not self._silent_frames:
+            try:
+                # Eagle already returns Python floats, so they go into the dict as-is
+                scores = self.eagle.process(samples)
+                if scores:
+                    most_likely_speaker = self.speaker_labels[int(np.argmax(scores))]
+                    speaker_scores = dict(zip(self.speaker_labels, scores))
+            except Exception as e:
+                self._log_frame_error("Speaker identification", e)
+                # Reset eagle on error
+                try:
+                    self.eagle.reset()
+                except Exception as reset_error:
+                    logger.error("Eagle reset failed, disabling speaker identification for this stream: %s", reset_error)
+                    self.eagle_broken = True
+
+        # Process transcription
+        transcript = ""
+        if not self.cheetah_broken:
+            try:
+                if not cheetah_paused:
+                    partial_transcript, is_endpoint = self.cheetah.process(samples)
+                    if partial_transcript or is_endpoint:
+                        transcript = partial_transcript
+                        if is_endpoint:
+                            remaining_text = self.cheetah.flush()
+                            if remaining_text:
+                                transcript += " " + remaining_text
+                elif self._silent_frames == SILENCE_FLUSH_FRAMES:
+                    # Long pause: finalize the pending transcript, then stop feeding Cheetah until speech resumes
+                    transcript = self.cheetah.flush()
+            except Exception as e:
+                self._log_frame_error("Transcription", e)
+                # Reset cheetah on error
+                try:
+                    self.cheetah.flush()
+                except Exception as flush_error:
+                    logger.error("Cheetah flush failed, disabling transcription for this stream: %s", flush_error)
+                    self.cheetah_broken = True
+
+        # Nothing new for the client (the common case for silence); skip building a result
+        if not transcript and not speaker_scores:
+            return None
+
+        # Plain dict matching TranscriptionResponse; it is serialized straight away
+        return {
+            "transcript": transcript.strip(),
+            "speaker_scores": speaker_scores,
+            "most_likely_speaker": most_likely_speaker
+        }
+
+    def _process_frames_sync(self, frames: List[bytes]) -> Optional[dict]:
+        """Process queued frames in order and merge them into a single result"""
+        result = None
+        transcripts = []
+        for frame_data in frames:
+            frame_result = self._process_frame_sync(frame_data)
+            if frame_result:
+                result = frame_result
+                if frame_result["transcript"]:
+                    transcripts.append(frame_result["transcript"])
+        if result:
+            result["transcript"] = " ".join(transcripts)
+        return result
+
+    def _flush_sync(self) -> Optional[dict]:
+        """Finalize Cheetah's pending transcript, e.g. before skipping ahead in the audio"""
+        if self.cheetah_broken:
+            return None
+        transcript = self.cheetah.flush().strip()
+        if transcript:
+            return {"transcript": transcript, "speaker_scores": {}, "most_likely_speaker": "Unknown"}
+        return None
+
+    async def _receive_frames(self, websocket: WebSocket, frames: asyncio.Queue) -> None:
+        try:
+            while True:
+                frames.put_nowait(await websocket.receive_bytes())
+        finally:
+            frames.put_nowait(None)  # End of stream
+
+    async def run(self, websocket: WebSocket, send: MessageSender = send_json) -> None:
+        loop = asyncio.get_running_loop()
+        frames = asyncio.Queue()
+        receiver = asyncio.create_task(self._receive_frames(websocket, frames))
+        scores_only = 0  # Score-only results skipped since the last send
+        lagging = False
+        try:
+            while True:
+                frame_data = await frames.get()
+                if frame_data is None:
+                    receiver.result()  # Re-raise what ended the stream
+                    break
+                # Take everything that queued up while the previous batch was processed
+                batch = [frame_data]
+                while not frames.empty():
+                    batch.append(frames.get_nowait())
+                if batch[-1] is None:
+                    batch.pop()
+                    frames.put_nowait(None)  # Handle end of stream on the next iteration
+                if len(batch) > STREAM_MAX_BACKLOG:
+                    # Too far behind real time: drop the stale audio and resume at the live edge
+                    if not lagging:
+                        logger.warning("Stream fell %d frames behind, dropping queued audio", len(batch))
+                        lagging = True
+                    result = await loop.run_in_executor(self.executor, self._flush_sync)
+                else:
+                    lagging = False
+                    result = await loop.run_in_executor(self.executor, self._process_frames_sync, batch)
+                if not result:
+                    continue
+                # Transcript updates go out immediately; score-only updates are thinned out
+                if not result["transcript"]:
+                    scores_only += 1
+                    if scores_only < SCORE_UPDATE_INTERVAL:
+                        continue
+                scores_only = 0
+                if VALIDATE_STREAM_RESPONSES:
+                    TranscriptionResponse.model_validate(result)
+                await send(websocket, result)
+        except Exception as e:
+            logger.info("Stream processing ended: %s", e)
+        finally:
+            receiver.cancel()
+
 class SpeechProcessor:
     def __init__(self, access_key: str, profiles_dir: str):
         self.access_key = access_key
         self.profiles_dir = profiles_dir
-        self.eagle = None
-        self.cheetah = None
         self.speaker_labels = []
         self.profiles = []
+        # Immutable copy of speaker_labels handed to streams; replaced whenever a profile is added
+        self._labels_tuple: Tuple[str, ...] = ()
+        # Directory mtime at the last scan, used to notice profiles enrolled by other workers
+        self._profiles_dir_mtime_ns = 0
+        # Parsed profiles keyed by path, tagged with the file's st_mtime_ns
+        self._profile_cache: Dict[str, Tuple[int, pveagle.EagleProfile]] = {}
         self._load_profiles()  # Only load profiles initially
         
+        # Each /stream connection borrows its own Cheetah and Eagle, so concurrent
+        # clients never share decoder state
+        self.cheetah_pool = EnginePool(self.create_cheetah, size=STREAM_POOL_SIZE,
+                                       reset=lambda cheetah: cheetah.flush())
+        self.eagle_pool = EnginePool(self.create_eagle, size=STREAM_POOL_SIZE,
+                                     reset=lambda eagle: eagle.reset())
+        self.profiler_pool = EnginePool(self.create_profiler, size=PROFILER_POOL_SIZE,
+                                        reset=lambda profiler: profiler.reset())
+        
     def _load_profiles(self):
-        """Load speaker profiles without initializing engines"""
+        """Load speaker profiles without initializing engines, re-parsing only changed files"""
         if not os.path.exists(self.profiles_dir):
             os.makedirs(self.profiles_dir)
             
+        self._profiles_dir_mtime_ns = os.stat(self.profiles_dir).st_mtime_ns
         self.speaker_labels = []
         self.profiles = []
+        cache = {}
         
-        for profile_file in os.listdir(self.profiles_dir):
-            if profile_file.endswith('.bin'):
-                profile_path = os.path.join(self.profiles_dir, profile_file)
-                self.speaker_labels.append(os.path.splitext(profile_file)[0])
-                with open(profile_path, 'rb') as f:
-                    profile = pveagle.EagleProfile.from_bytes(f.read())
+        with os.scandir(self.profiles_dir) as entries:
+            for entry in entries:
+                if not (entry.name.endswith('.bin') and entry.is_file()):
+                    continue
+                mtime_ns = entry.stat().st_mtime_ns
+                cached = self._profile_cache.get(entry.path)
+                if cached and cached[0] == mtime_ns:
+                    profile = cached[1]
+                else:
+                    with open(entry.path, 'rb') as f:
+                        profile = pveagle.EagleProfile.from_bytes(f.read())
+                cache[entry.path] = (mtime_ns, profile)
+                self.speaker_labels.append(os.path.splitext(entry.name)[0])
                 self.profiles.append(profile)
-
-    def _ensure_cheetah_initialized(self):
-        """Lazy initialization of Cheetah"""
-        if self.cheetah is None:
-            self.cheetah = pvcheetah.create(
-                access_key=self.access_key,
-                endpoint_duration_sec=0.5,
-                enable_automatic_punctuation=True
-            )
-
-    def _ensure_eagle_initialized(self):
-        """Lazy initialization of Eagle"""
-        if self.eagle is None and self.profiles:
-            self.eagle = pveagle.create_recognizer(
-                access_key=self.access_key,
-                speaker_profiles=self.profiles
-            )
-
-    def process_frame(self, frame_data: bytes) -> Optional[TranscriptionResponse]:
-        # Convert bytes to PCM data (assuming 16-bit audio)
-        pcm_data = list(struct.unpack('h' * (len(frame_data) // 2), frame_data))
         
-        if len(pcm_data) != 512:  # Ensure frame size is correct
-            return None
+        self._profile_cache = cache
+        self._labels_tuple = tuple(self.speaker_labels)
 
-        # Process speaker identification
-        speaker_scores = {}
-        most_likely_speaker = "Unknown"
-        
-        try:
-            self._ensure_eagle_initialized()
-            if self.eagle:
-                scores = self.eagle.process(pcm_data)
-                speaker_scores = {
-                    label: float(score) 
-                    for label, score in zip(self.speaker_labels, scores)
-                }
-                if speaker_scores:
-                    most_likely_speaker = max(speaker_scores.items(), key=lambda x: x[1])[0]
-        except Exception as e:
-            print(f"Speaker identification error: {str(e)}")
-            # Reset eagle on error
-            self.eagle = None
+    def create_cheetah(self) -> pvcheetah.Cheetah:
+        return pvcheetah.create(
+            access_key=self.access_key,
+            endpoint_duration_sec=0.5,
+            enable_automatic_punctuation=True
+        )
 
-        # Process transcription
-        transcript = ""
-        try:
-            self._ensure_cheetah_initialized()
-            partial_transcript, is_endpoint = self.cheetah.process(pcm_data)
-            if partial_transcript or is_endpoint:
-                transcript = partial_transcript
-                if is_endpoint:
-                    remaining_text = self.cheetah.flush()
-                    if remaining_text:
-                        transcript += " " + remaining_text
-        except Exception as e:
-            print(f"Transcription error: {str(e)}")
-            # Reset cheetah on error
-            self.cheetah = None
-
-        if transcript or speaker_scores:
-            return TranscriptionResponse(
-                transcript=transcript.strip(),
-                speaker_scores=speaker_scores,
-                most_likely_speaker=most_likely_speaker
-            )
-        return None
+    def create_eagle(self) -> pveagle.Eagle:
+        return pveagle.create_recognizer(
+            access_key=self.access_key,
+            speaker_profiles=self.profiles
+        )
 
-    async def process_stream(self, websocket: WebSocket) -> None:
-        try:
-            while True:
-                frame_data = await websocket.receive_bytes()
-                result = self.process_frame(frame_data)
-                if result:
-                    await websocket.send_json(result.dict())
-        except Exception as e:
-            print(f"Stream processing error: {str(e)}")
-        finally:
-            # Clean up resources
-            if self.cheetah:
-                self.cheetah = None
-            if self.eagle:
-                self.eagle = None
+    def create_profiler(self) -> pveagle.EagleProfiler:
+        return pveagle.create_profiler(access_key=self.access_key)
 
-    async def enroll_speaker(self, profile_name: str, websocket: WebSocket) -> None:
-        try:
-            eagle_profiler = pveagle.create_profiler(access_key=self.access_key)
-            
-            while True:
-                try:
-                    frame_data = await websocket.receive_bytes()
-                    pcm_data = list(struct.unpack('h' * (len(frame_data) // 2), frame_data))
-                    
-                    if len(pcm_data) != 512:  # Ensure frame size is correct
-                        await websocket.send_json({
-                            "status": "error",
-                            "message": "Invalid frame size"
-                        })
-                        continue
+    def _refresh_profiles(self) -> None:
+        """Reload profiles if another worker enrolled one; a single stat when nothing changed"""
+        if os.stat(self.profiles_dir).st_mtime_ns != self._profiles_dir_mtime_ns:
+            self._load_profiles()
+            self.eagle_pool.invalidate()
 
-                    enroll_percentage, feedback = eagle_profiler.enroll(pcm_data)
-                    
-                    await websocket.send_json({
+    async def open_stream(self) -> StreamSession:
+        """Borrow engines for a new /stream connection
+
+        Raises asyncio.TimeoutError when every engine stays busy for POOL_ACQUIRE_TIMEOUT seconds.
+        """
+        self._refresh_profiles()
+        cheetah = await self.cheetah_pool.acquire(POOL_ACQUIRE_TIMEOUT)
+        eagle = None
+        if self.profiles:
+            try:
+                eagle = await self.eagle_pool.acquire(POOL_ACQUIRE_TIMEOUT)
+            except BaseException:
+                await self.cheetah_pool.release(cheetah)
+                raise
+        return StreamSession(cheetah, eagle, self._labels_tuple)
+
+    async def close_stream(self, session: StreamSession) -> None:
+        # Let any in-flight frame finish before the engines are reset for the next client
+        await asyncio.to_thread(session.executor.shutdown)
+        await self.cheetah_pool.release(session.cheetah, discard=session.cheetah_broken)
+        if session.eagle:
+            await self.eagle_pool.release(session.eagle, discard=session.eagle_broken)
+
+    async def preload(self) -> None:
+        """Create every pooled engine up front so no connection pays the model load
+
+        Pools still create engines on demand after invalidation or a failed reset.
+        """
+        await self.cheetah_pool.fill()
+        if self.profiles:
+            await self.eagle_pool.fill()
+        await self.profiler_pool.fill()
+
+    def close(self) -> None:
+        self.cheetah_pool.close()
+        self.eagle_pool.close()
+        self.profiler_pool.close()
+
+    async def enroll_speaker(self, profile_name: str, websocket: WebSocket,
+                             eagle_profiler: pveagle.EagleProfiler) -> None:
+        # Progress is only reported when it moves noticeably or the feedback changes
+        last_sent_percentage = -PROGRESS_UPDATE_STEP
+        last_feedback = None
+        while True:
+            try:
+                frame_data = await websocket.receive_bytes()
+                pcm = np.frombuffer(frame_data, dtype=np.int16)
+                
+                if pcm.size != 512:  # Ensure frame size is correct
+                    await send_json(websocket, {
+                        "status": "error",
+                        "message": "Invalid frame size"
+                    })
+                    continue
+
+                # A list converts to the profiler's ctypes input much faster than an ndarray
+                enroll_percentage, feedback = eagle_profiler.enroll(pcm.tolist())
+                
+                if (enroll_percentage >= 100.0 or feedback != last_feedback or
+                        enroll_percentage - last_sent_percentage >= PROGRESS_UPDATE_STEP):
+                    await send_json(websocket, {
                         "status": "progress",
                         "percentage": enroll_percentage,
                         "feedback": feedback
                     })
+                    last_sent_percentage = enroll_percentage
+                    last_feedback = feedback
+                
+                if enroll_percentage >= 100.0:
+                    # Export and save profile
+                    profile = eagle_profiler.export()
+                    profile_path = os.path.join(self.profiles_dir, f"{profile_name}.bin")
                     
-                    if enroll_percentage >= 100.0:
-                        # Export and save profile
-                        profile = eagle_profiler.export()
-                        profile_path = os.path.join(self.profiles_dir, f"{profile_name}.bin")
-                        
-                        with open(profile_path, 'wb') as f:
-                            f.write(profile.to_bytes())
-                        
-                        # Update processor state
-                        self.speaker_labels.append(profile_name)
-                        self.profiles.append(profile)
-                        
-                        # Reinitialize recognizer
-                        self.eagle = pveagle.create_recognizer(
-                            access_key=self.access_key,
-                            speaker_profiles=self.profiles
-                        )
-                        
-                        await websocket.send_json({
-                            "status": "success",
-                            "message": f"Profile {profile_name} created successfully"
-                        })
-                        break
-
-                except Exception as e:
-                    await websocket.send_json({
-                        "status": "error",
-                        "message": f"Error during enrollment: {str(e)}"
+                    # Write then rename so other workers scanning the directory never read a partial file
+                    tmp_path = f"{profile_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(profile.to_bytes())
+                    os.replace(tmp_path, profile_path)
+                    
+                    # Update processor state
+                    self.speaker_labels.append(profile_name)
+                    self.profiles.append(profile)
+                    self._profile_cache[profile_path] = (os.stat(profile_path).st_mtime_ns, profile)
+                    self._labels_tuple = tuple(self.speaker_labels)
+                    self._profiles_dir_mtime_ns = os.stat(self.profiles_dir).st_mtime_ns
+                    
+                    # Retire pooled recognizers; new streams build one with the new profile
+                    # lazily, so the rebuild stays off this response
+                    self.eagle_pool.invalidate()
+                    
+                    await send_json(websocket, {
+                        "status": "success",
+                        "message": f"Profile {profile_name} created successfully"
                     })
                     break
-                    
-        finally:
-            if 'eagle_profiler' in locals():
-                eagle_profiler.delete()
+
+            except Exception as e:
+                await send_json(websocket, {
+                    "status": "error",
+                    "message": f"Error during enrollment: {str(e)}"
+                })
+                break
 
 # Global processor instance
 speech_processor = None
+log_listener = None
 
 @app.on_event("startup")
 async def startup_event():
-    global speech_processor
+    global speech_processor, log_listener
+    log_listener = configure_logging()
     access_key = os.getenv("PICOVOICE_ACCESS_KEY")
     profiles_dir = os.getenv("PROFILES_DIR", "./profiles")
     
@@ -223,65 +565,102 @@ async def startup_event():
         raise ValueError("PICOVOICE_ACCESS_KEY environment variable not set")
     
     speech_processor = SpeechProcessor(access_key, profiles_dir)
+    await speech_processor.preload()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if speech_processor:
+        speech_processor.close()
+    if log_listener:
+        log_listener.stop()
 
 @app.websocket("/stream")
 async def stream_audio(websocket: WebSocket):
     if not speech_processor:
-        print("Error: Speech processor not initialized")
+        logger.error("Speech processor not initialized")
         await websocket.close(code=1011, reason="Speech processor not initialized")
         return
     
-    print(f"New streaming connection request from {websocket.client}")    
+    logger.info("New streaming connection request from %s", websocket.client)
+    session = None
+    # Clients offering the "msgpack" subprotocol get MessagePack binary frames instead of JSON text
+    use_msgpack = "msgpack" in websocket.scope.get("subprotocols", [])
+    send = send_msgpack if use_msgpack else send_json
     try:
-        await websocket.accept()
-        print(f"Streaming connection accepted for {websocket.client}")
+        await websocket.accept(subprotocol="msgpack" if use_msgpack else None)
+        logger.info("Streaming connection accepted for %s", websocket.client)
+        
+        try:
+            session = await speech_processor.open_stream()
+        except asyncio.TimeoutError:
+            logger.warning("No free engines for %s, rejecting connection", websocket.client)
+            await websocket.close(code=1013, reason="Server busy, try again later")
+            return
         
         # Send initial connection success message
-        await websocket.send_json({
+        await send(websocket, {
             "status": "connected",
             "message": "WebSocket connection established"
         })
         
-        await speech_processor.process_stream(websocket)
+        await session.run(websocket, send)
     except WebSocketDisconnect as e:
-        print(f"Client {websocket.client} disconnected from streaming with code {e.code}")
+        logger.info("Client %s disconnected from streaming with code %s", websocket.client, e.code)
     except Exception as e:
-        print(f"Error in streaming connection: {str(e)}")
+        logger.exception("Error in streaming connection")
         error_msg = {"status": "error", "message": str(e)}
         try:
             if not websocket.client_state.DISCONNECTED:
-                await websocket.send_json(error_msg)
+                await send(websocket, error_msg)
                 await websocket.close(code=1011)
         except:
             pass
+    finally:
+        if session:
+            await speech_processor.close_stream(session)
 
 @app.websocket("/enroll/{profile_name}")
 async def enroll_speaker(websocket: WebSocket, profile_name: str):
     if not speech_processor:
-        print("Error: Speech processor not initialized")
+        logger.error("Speech processor not initialized")
         await websocket.close(code=1011, reason="Speech processor not initialized")
         return
     
-    print(f"New enrollment connection request from {websocket.client} for profile {profile_name}")
+    logger.info("New enrollment connection request from %s for profile %s", websocket.client, profile_name)
     try:
         await websocket.accept()
-        print(f"Enrollment connection accepted for {websocket.client}")
+        logger.info("Enrollment connection accepted for %s", websocket.client)
         
-        # Send initial connection success message
-        await websocket.send_json({
-            "status": "connected",
-            "message": f"WebSocket connection established for enrolling profile: {profile_name}"
-        })
+        try:
+            eagle_profiler = await speech_processor.profiler_pool.acquire(timeout=0)
+            pooled = True
+        except asyncio.TimeoutError:
+            # Every pooled profiler is busy: build a one-off instead of turning the enrollment away
+            logger.info("No free profiler for %s, creating a temporary one", websocket.client)
+            eagle_profiler = await asyncio.to_thread(speech_processor.create_profiler)
+            pooled = False
         
-        await speech_processor.enroll_speaker(profile_name, websocket)
+        try:
+            # Send initial connection success message
+            await send_json(websocket, {
+                "status": "connected",
+                "message": f"WebSocket connection established for enrolling profile: {profile_name}"
+            })
+            
+            await speech_processor.enroll_speaker(profile_name, websocket, eagle_profiler)
+        finally:
+            if pooled:
+                await speech_processor.profiler_pool.release(eagle_profiler)
+            else:
+                eagle_profiler.delete()
     except WebSocketDisconnect as e:
-        print(f"Client {websocket.client} disconnected from enrollment with code {e.code}")
+        logger.info("Client %s disconnected from enrollment with code %s", websocket.client, e.code)
     except Exception as e:
-        print(f"Error in enrollment connection: {str(e)}")
+        logger.exception("Error in enrollment connection")
         error_msg = {"status": "error", "message": str(e)}
         try:
             if not websocket.client_state.DISCONNECTED:
-                await websocket.send_json(error_msg)
+                await send_json(websocket, error_msg)
                 await websocket.close(code=1011)
         except:
             pass
@@ -290,6 +669,8 @@ async def enroll_speaker(websocket: WebSocket, profile_name: str):
 async def list_speakers() -> List[str]:
     if not speech_processor:
         raise HTTPException(status_code=500, detail="Speech processor not initialized")
+    # Pick up profiles enrolled through other workers
+    speech_processor._refresh_profiles()
     return speech_processor.speaker_labels
 
 @app.get("/health")
@@ -314,15 +695,24 @@ def main():
     parser = argparse.ArgumentParser(description='Speech Recognition API Server')
     parser.add_argument('--host', default='0.0.0.0', help='Host to bind the server to')
     parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8001')), help='Port to bind the server to')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '2')),
+                        help='Number of worker processes, each with its own engines')
     
     args = parser.parse_args()
     
     # Configure logging
     uvicorn.config.LOGGING_CONFIG["formatters"]["default"]["fmt"] = "%(asctime)s - %(levelname)s - %(message)s"
     
+    # Prefer uvloop's libuv event loop; fall back to asyncio where it's unavailable (e.g. Windows)
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    
     # Run with production settings and WebSocket support
     uvicorn.run(
-        app,
+        "api_server:app",       # Import string so each worker process loads its own app
         host=args.host,
         port=args.port,
         log_level="info",
@@ -330,7 +720,9 @@ def main():
         forwarded_allow_ips="*",
         ws_ping_interval=20.0,  # Send ping frames every 20 seconds
         ws_ping_timeout=20.0,   # Wait 20 seconds for pong response
-        ws='websockets'         # Use websockets package for WebSocket support
+        ws='websockets',        # Use websockets package for WebSocket support
+        loop=loop,
+        workers=args.workers
     )
 
 if __name__ == "__main__":
@@ -2,60 +2,54 @@ import asyncio
 import websockets
 import argparse
 from pvrecorder import PvRecorder
-import json
-import struct
+from _audio_pump import stream_audio
 import time
+from _compat import dumps, loads, use_uvloop
+
+BATCH_FRAMES = 4  # Frames (32 ms each) sent per WebSocket message
+HELLO_ENROLLMENT = dumps({'type': 'enrollment'})  # Connection handshake, encoded once
 
 async def enroll_profile(websocket, recorder, profile_name):
     try:
         # Send enrollment request with profile name
-        await websocket.send(json.dumps({
-            'type': 'enrollment',
-        }))
+        await websocket.send(HELLO_ENROLLMENT)
         
         # Send profile name
-        await websocket.send(json.dumps({
+        await websocket.send(dumps({
             'profile_name': profile_name
         }))
         
         print("\nStarted enrollment... Keep speaking until the process completes.")
         print("The enrollment will automatically finish when enough audio is collected.")
         
-        last_update_time = time.time()
-        update_interval = 0.1  # Update display every 100ms
+        stop = asyncio.Event()
         
-        while True:
-            # Read audio frame from microphone
-            pcm_frame = recorder.read()
-            
-            # Convert PCM data to bytes using struct.pack
-            audio_bytes = struct.pack('%dh' % len(pcm_frame), *pcm_frame)
-            
-            # Send audio data
-            await websocket.send(audio_bytes)
-            
-            # Get enrollment feedback
+        async def receiver():
+            # Feedback arrives independently of sends; no polling between frames
+            last_update_time = time.time()
+            update_interval = 0.1  # Update display every 100ms
             try:
-                response = await asyncio.wait_for(websocket.recv(), timeout=0.1)
-                result = json.loads(response)
-                
-                if 'error' in result:
-                    print(f"\nError: {result['error']}")
-                    break
-                elif 'status' in result:
-                    print(f"\n{result['message']}")
-                    break
-                else:
-                    current_time = time.time()
-                    if current_time - last_update_time >= update_interval:
-                        # Print enrollment progress
-                        print(f"\rProgress: {result['percentage']:.1f}% - {result['feedback']}", 
-                              end='', flush=True)
-                        last_update_time = current_time
+                async for response in websocket:
+                    result = loads(response)
                     
-            except asyncio.TimeoutError:
-                # No feedback received, continue recording
-                continue
+                    if 'error' in result:
+                        print(f"\nError: {result['error']}")
+                        break
+                    elif 'status' in result:
+                        print(f"\n{result['message']}")
+                        break
+                    else:
+                        current_time = time.time()
+                        if current_time - last_update_time >= update_interval:
+                            # Print enrollment progress
+                            print(f"\rProgress: {result['percentage']:.1f}% - {result['feedback']}", 
+                                  end='', flush=True)
+                            last_update_time = current_time
+            finally:
+                # Enrollment finished or failed: stop recording
+                stop.set()
+        
+        await stream_audio(websocket, recorder, receiver(), stop_event=stop, batch_frames=BATCH_FRAMES)
                 
     except Exception as e:
         print(f"\nError: {str(e)}")
@@ -80,7 +74,8 @@ async def main():
         uri = f"ws://{args.host}:{args.port}"
         print(f"Connecting to {uri}...")
         
-        async with websockets.connect(uri) as websocket:
+        # No permessage-deflate: compressing PCM audio costs CPU for no gain
+        async with websockets.connect(uri, compression=None, max_size=2**20) as websocket:
             print("Connected to WebSocket server")
             
             # Start recording
@@ -96,4 +91,6 @@ async def main():
         recorder.delete()
 
 if __name__ == "__main__":
+    use_uvloop()
+    
     asyncio.run(main()) 
\ No newline at end of file
@@ -1,11 +1,13 @@
 import asyncio
-import json
 import websockets
 import numpy as np
 import pveagle
 import os
-import struct
 from typing import List, Dict
+from _compat import dumps, loads, use_uvloop
+
+# Frames whose peak amplitude is below this skip Eagle
+SILENCE_THRESHOLD = 100
 
 class EagleWebSocketServer:
     def __init__(self, access_key: str, profiles_dir: str):
@@ -21,13 +23,13 @@ class EagleWebSocketServer:
         if not os.path.exists(self.profiles_dir):
             os.makedirs(self.profiles_dir)
             
-        for profile_file in os.listdir(self.profiles_dir):
-            if profile_file.endswith('.bin'):
-                profile_path = os.path.join(self.profiles_dir, profile_file)
-                self.speaker_labels.append(os.path.splitext(profile_file)[0])
-                with open(profile_path, 'rb') as f:
-                    profile = pveagle.EagleProfile.from_bytes(f.read())
-                self.profiles.append(profile)
+        with os.scandir(self.profiles_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.bin') and entry.is_file():
+                    self.speaker_labels.append(os.path.splitext(entry.name)[0])
+                    with open(entry.path, 'rb') as f:
+                        profile = pveagle.EagleProfile.from_bytes(f.read())
+                    self.profiles.append(profile)
 
         if self.profiles:
             self.eagle = pveagle.create_recognizer(
@@ -44,43 +46,58 @@ class EagleWebSocketServer:
             
             # Get profile name from client
             msg = await websocket.recv()
-            profile_data = json.loads(msg)
+            profile_data = loads(msg)
             profile_name = profile_data.get('profile_name')
             
             if not profile_name:
-                await websocket.send(json.dumps({
-                    'error': 'Profile name not provided'
-                }))
+                await websocket.send(ERROR_NO_PROFILE_NAME)
                 return
                 
             print(f"Starting enrollment for profile: {profile_name}")
             
             # Calculate minimum samples needed
             min_samples = eagle_profiler.min_enroll_samples
-            accumulated_samples = []
+            
+            # Preallocated ring of samples; [head:tail] is audio not yet enrolled
+            ring = np.empty(min_samples * 4, dtype=np.int16)
+            head = tail = 0
             
             while enroll_percentage < 100.0:
-                # Receive audio data
+                # Receive audio data and view it as 16-bit PCM without copying
                 audio_data = await websocket.recv()
-                pcm_data = list(struct.unpack('h' * (len(audio_data) // 2), audio_data))
-                accumulated_samples.extend(pcm_data)
+                pcm_data = np.frombuffer(audio_data, dtype=np.int16)
                 
-                # Process enrollment with accumulated samples
-                if len(accumulated_samples) >= min_samples:
-                    enroll_percentage, feedback = eagle_profiler.enroll(accumulated_samples)
-                    accumulated_samples = []  # Clear accumulated samples after processing
-                else:
+                if tail + pcm_data.size > ring.size:
+                    # Out of room at the end: move the unenrolled remainder to the front
+                    pending = tail - head
+                    if pending + pcm_data.size > ring.size:
+                        # Unusually large message: grow the ring as well
+                        grown = np.empty(pending + pcm_data.size + min_samples, dtype=np.int16)
+                        grown[:pending] = ring[head:tail]
+                        ring = grown
+                    else:
+                        ring[:pending] = ring[head:tail]
+                    head, tail = 0, pending
+                ring[tail:tail + pcm_data.size] = pcm_data
+                tail += pcm_data.size
+                
+                # Enroll in min_samples chunks, keeping any remainder for the next chunk
+                enrolled = False
+                while tail - head >= min_samples and enroll_percentage < 100.0:
+                    # A list converts to the profiler's ctypes input much faster than an ndarray
+                    enroll_percentage, feedback = eagle_profiler.enroll(ring[head:head + min_samples].tolist())
+                    head += min_samples
+                    enrolled = True
+                if not enrolled:
                     # Still collecting samples
-                    enroll_percentage = (len(accumulated_samples) / min_samples) * 100
+                    enroll_percentage = ((tail - head) / min_samples) * 100
                     feedback = pveagle.EagleProfilerEnrollFeedback.AUDIO_TOO_SHORT
                 
                 # Only send feedback if there's a change
-                if feedback != last_feedback or len(accumulated_samples) == 0:
-                    response = {
-                        'percentage': enroll_percentage,
-                        'feedback': FEEDBACK_TO_DESCRIPTIVE_MSG.get(feedback, str(feedback))
-                    }
-                    await websocket.send(json.dumps(response))
+                if feedback != last_feedback or enrolled:
+                    # Only the percentage varies, so splice it into the pre-encoded feedback text
+                    feedback_json = FEEDBACK_JSON[feedback.value] or dumps(str(feedback))
+                    await websocket.send(FEEDBACK_RESPONSE_TEMPLATE % (float(enroll_percentage), feedback_json))
                     last_feedback = feedback
             
             # Export and save profile
@@ -100,14 +117,14 @@ class EagleWebSocketServer:
                 speaker_profiles=self.profiles
             )
             
-            await websocket.send(json.dumps({
+            await websocket.send(dumps({
                 'status': 'success',
                 'message': f'Profile {profile_name} created successfully'
             }))
             
         except Exception as e:
             print(f"Error during enrollment: {str(e)}")
-            await websocket.send(json.dumps({
+            await websocket.send(dumps({
                 'error': str(e)
             }))
         finally:
@@ -115,39 +132,48 @@ class EagleWebSocketServer:
                 eagle_profiler.delete()
 
     async def process_audio(self, websocket):
+        # Number of labels the client knows about; scores are sent by position
+        labels_sent = 0
         try:
             while True:
                 # Receive audio data as bytes
                 audio_data = await websocket.recv()
                 
-                # Convert bytes to PCM data
-                pcm_data = struct.unpack('h' * (len(audio_data) // 2), audio_data)
+                # View bytes as 16-bit PCM without copying
+                pcm_data = np.frombuffer(audio_data, dtype=np.int16)
                 
                 # Process the audio with Eagle
                 if self.eagle:
-                    scores = self.eagle.process(pcm_data)
+                    # A message may carry several frames; Eagle takes exactly frame_length samples at a time
+                    frame_length = self.eagle.frame_length
+                    num_frames = pcm_data.size // frame_length
+                    scores = None
+                    for frame in pcm_data[:num_frames * frame_length].reshape(num_frames, frame_length):
+                        # Skip silent frames (peak amplitude, without allocating an abs() temporary)
+                        if max(int(frame.max()), -int(frame.min())) >= SILENCE_THRESHOLD:
+                            # A list converts to Eagle's ctypes input much faster than an ndarray
+                            scores = self.eagle.process(frame.tolist())
+                    if scores is None:
+                        # Nothing voiced in this message, so the client's last scores still stand
+                        continue
                     
-                    # Create response with speaker scores
-                    response = {
-                        'scores': {
-                            label: float(score) 
-                            for label, score in zip(self.speaker_labels, scores)
-                        }
-                    }
+                    # Labels only change when an enrollment finishes; announce them before the scores
+                    if len(self.speaker_labels) != labels_sent:
+                        labels_sent = len(self.speaker_labels)
+                        await websocket.send(dumps({'speakers': self.speaker_labels}))
                     
-                    # Send back the results
-                    await websocket.send(json.dumps(response))
+                    # Eagle's scores are running estimates, so the last frame's are the current ones
+                    # Send them back as little-endian float32 after a one-byte message type
+                    await websocket.send(SCORES_MESSAGE + np.asarray(scores, dtype='<f4').tobytes())
                 else:
-                    await websocket.send(json.dumps({
-                        'error': 'No speaker profiles loaded'
-                    }))
+                    await websocket.send(ERROR_NO_PROFILES)
 
         except websockets.exceptions.ConnectionClosed:
             print("Client disconnected")
         except Exception as e:
             print(f"Error processing audio: {str(e)}")
             try:
-                await websocket.send(json.dumps({'error': str(e)}))
+                await websocket.send(dumps({'error': str(e)}))
             except:
                 pass
 
@@ -155,7 +181,7 @@ class EagleWebSocketServer:
         try:
             # Get connection type from client
             msg = await websocket.recv()
-            connection_data = json.loads(msg)
+            connection_data = loads(msg)
             connection_type = connection_data.get('type', 'recognition')
             
             if connection_type == 'enrollment':
@@ -166,12 +192,14 @@ class EagleWebSocketServer:
         except Exception as e:
             print(f"Error handling connection: {str(e)}")
             try:
-                await websocket.send(json.dumps({'error': str(e)}))
+                await websocket.send(dumps({'error': str(e)}))
             except:
                 pass
 
     async def start_server(self, host: str = 'localhost', port: int = 8765):
-        async with websockets.serve(self.handle_connection, host, port):
+        # PCM audio doesn't deflate, so skip permessage-deflate; pings keep idle proxies from dropping us
+        async with websockets.serve(self.handle_connection, host, port, compression=None,
+                                    max_size=2**20, ping_interval=20, ping_timeout=20):
             print(f"WebSocket server started at ws://{host}:{port}")
             await asyncio.Future()  # run forever
 
@@ -184,6 +212,19 @@ FEEDBACK_TO_DESCRIPTIVE_MSG = {
     pveagle.EagleProfilerEnrollFeedback.QUALITY_ISSUE: 'Low audio quality due to bad microphone or environment'
 }
 
+# JSON-encoded feedback strings indexed by feedback value, computed once instead of on every enrollment update
+FEEDBACK_JSON = [None] * (max(feedback.value for feedback in pveagle.EagleProfilerEnrollFeedback) + 1)
+for feedback, message in FEEDBACK_TO_DESCRIPTIVE_MSG.items():
+    FEEDBACK_JSON[feedback.value] = dumps(message)
+FEEDBACK_RESPONSE_TEMPLATE = '{"percentage": %r, "feedback": %s}'
+
+# Binary message type for speaker scores; JSON messages travel as text frames
+SCORES_MESSAGE = b'\x01'
+
+# Static error responses, encoded once
+ERROR_NO_PROFILE_NAME = dumps({'error': 'Profile name not provided'})
+ERROR_NO_PROFILES = dumps({'error': 'No speaker profiles loaded'})
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description='Eagle WebSocket Server')
@@ -196,6 +237,8 @@ def main():
     
     server = EagleWebSocketServer(args.access_key, args.profiles_dir)
     
+    use_uvloop()
+    
     asyncio.run(server.start_server(args.host, args.port))
 
 if __name__ == "__main__":
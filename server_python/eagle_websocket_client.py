@@ -2,38 +2,58 @@ import asyncio
 import websockets
 import argparse
 from pvrecorder import PvRecorder
-import json
-import struct
+from _audio_pump import stream_audio
+import numpy as np
+import sys
+import time
+from _compat import dumps, loads, use_uvloop
+
+BATCH_FRAMES = 4  # Frames (32 ms each) sent per WebSocket message
+PRINT_INTERVAL = 0.2  # Seconds between score line updates
+SCORES_MESSAGE = b'\x01'  # Binary message type for speaker scores
+HELLO_RECOGNITION = dumps({'type': 'recognition'})  # Connection handshake, encoded once
 
 async def send_audio_stream(websocket, recorder, frame_length):
     try:
         # Send connection type
-        await websocket.send(json.dumps({
-            'type': 'recognition'
-        }))
+        await websocket.send(HELLO_RECOGNITION)
         
         print("Started streaming audio... Press Ctrl+C to stop")
-        while True:
-            # Read audio frame from microphone
-            pcm_frame = recorder.read()
-            
-            # Convert PCM data to bytes using struct.pack
-            audio_bytes = struct.pack('%dh' % len(pcm_frame), *pcm_frame)
-            
-            # Send audio data
-            await websocket.send(audio_bytes)
-            
-            # Receive and print results
-            response = await websocket.recv()
-            results = json.loads(response)
-            
-            if 'error' in results:
-                print(f"\rError: {results['error']}", end='', flush=True)
-            else:
-                # Print speaker recognition scores
-                scores_str = ' | '.join(f"{speaker}: {score:.2f}" 
-                                      for speaker, score in results['scores'].items())
-                print(f"\rScores: {scores_str}", end='', flush=True)
+        stop = asyncio.Event()
+        
+        async def receiver():
+            # Results arrive independently of sends, so a slow reply never stalls the audio
+            try:
+                last_print_time = 0.0
+                speaker_labels = []
+                async for response in websocket:
+                    if isinstance(response, bytes):
+                        if response[:1] != SCORES_MESSAGE:
+                            continue
+                        
+                        # Scores arrive several times a second; a slow terminal shouldn't hold up the loop
+                        now = time.monotonic()
+                        if now - last_print_time < PRINT_INTERVAL:
+                            continue
+                        last_print_time = now
+                        
+                        # Print speaker recognition scores, which follow the order of speaker_labels
+                        scores = np.frombuffer(response, dtype='<f4', offset=1)
+                        scores_str = ' | '.join(f"{speaker}: {score:.2f}" 
+                                              for speaker, score in zip(speaker_labels, scores))
+                        sys.stdout.write(f"\rScores: {scores_str}")
+                        sys.stdout.flush()
+                        continue
+                    
+                    results = loads(response)
+                    if 'error' in results:
+                        print(f"\rError: {results['error']}", end='', flush=True)
+                    elif 'speakers' in results:
+                        speaker_labels = results['speakers']
+            finally:
+                stop.set()
+        
+        await stream_audio(websocket, recorder, receiver(), stop_event=stop, batch_frames=BATCH_FRAMES)
                 
     except KeyboardInterrupt:
         print("\nStopping audio stream...")
@@ -58,7 +78,8 @@ async def main():
         uri = f"ws://{args.host}:{args.port}"
         print(f"Connecting to {uri}...")
         
-        async with websockets.connect(uri) as websocket:
+        # No permessage-deflate: compressing PCM audio costs CPU for no gain
+        async with websockets.connect(uri, compression=None, max_size=2**20) as websocket:
             print(f"Connected to WebSocket server")
             
             # Start recording
@@ -74,4 +95,6 @@ async def main():
         recorder.delete()
 
 if __name__ == "__main__":
+    use_uvloop()
+    
     asyncio.run(main()) 
\ No newline at end of file
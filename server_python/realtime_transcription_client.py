@@ -2,12 +2,12 @@ import asyncio
 import websockets
 import argparse
 from pvrecorder import PvRecorder
-import json
-import struct
+from _audio_pump import stream_audio
 import time
 import sys
 import os
 from datetime import datetime
+from _compat import loads, use_uvloop
 
 class TranscriptionClient:
     def __init__(self, host: str, port: int, audio_device_index: int = -1):
@@ -15,6 +15,7 @@ class TranscriptionClient:
         self.audio_device_index = audio_device_index
         self.recorder = None
         self.frame_length = 512  # Small frame length for real-time processing
+        self.batch_frames = 4  # Frames sent per WebSocket message (~128 ms of audio)
         self.last_log_time = time.time()
 
     def _clear_line(self):
@@ -30,67 +31,61 @@ class TranscriptionClient:
             return True
         return False
 
+    async def _receive_results(self, websocket, stop: asyncio.Event):
+        current_speaker = None
+        try:
+            async for response in websocket:
+                result = loads(response)
+                
+                if 'error' in result:
+                    print(f"\n❌ Error: {result['error']}")
+                    break
+                
+                transcript = result.get('transcript', '').strip()
+                if transcript:
+                    speaker = result.get('most_likely_speaker', 'Unknown')
+                    scores = result.get('speaker_scores', {})
+                    
+                    # If speaker changed or we should log based on time
+                    if speaker != current_speaker or self._should_log():
+                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                        print(f"\n⏰ [{timestamp}]")
+                        print(f"👤 Speaker: {speaker}")
+                        # Format speaker scores
+                        scores_str = ' | '.join(
+                            f"{name}: {score:.2f}"
+                            for name, score in scores.items()
+                        )
+                        print(f"📊 Confidence: {scores_str}")
+                        current_speaker = speaker
+                    
+                    # Update transcript in place
+                    self._clear_line()
+                    print(f"🗣️ {transcript}", end='', flush=True)
+                elif self._should_log():
+                    # No transcription received, but still log every second
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    print(f"\n⏰ [{timestamp}] Listening...")
+        finally:
+            stop.set()
+
     async def start_transcription(self):
         try:
             # Initialize recorder
             self.recorder = PvRecorder(device_index=self.audio_device_index, frame_length=self.frame_length)
             
-            # Connect to WebSocket server
-            async with websockets.connect(self.uri) as websocket:
+            # Connect to WebSocket server (no permessage-deflate: compressing PCM audio costs CPU for no gain)
+            async with websockets.connect(self.uri, compression=None, max_size=2**20) as websocket:
                 print(f"\n🎤 Connected to transcription server at {self.uri}")
                 print("Listening for speech... Press Ctrl+C to stop\n")
                 
                 # Start recording
                 self.recorder.start()
-                current_speaker = None
                 
-                while True:
-                    # Read audio frame from microphone
-                    pcm_frame = self.recorder.read()
-                    
-                    # Convert PCM data to bytes
-                    audio_bytes = struct.pack('%dh' % len(pcm_frame), *pcm_frame)
-                    
-                    # Send audio data
-                    await websocket.send(audio_bytes)
-                    
-                    # Get transcription results
-                    try:
-                        response = await asyncio.wait_for(websocket.recv(), timeout=0.1)
-                        result = json.loads(response)
-                        
-                        if 'error' in result:
-                            print(f"\n❌ Error: {result['error']}")
-                            break
-                        
-                        transcript = result.get('transcript', '').strip()
-                        if transcript:
-                            speaker = result.get('most_likely_speaker', 'Unknown')
-                            scores = result.get('speaker_scores', {})
-                            
-                            # If speaker changed or we should log based on time
-                            if speaker != current_speaker or self._should_log():
-                                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                print(f"\n⏰ [{timestamp}]")
-                                print(f"👤 Speaker: {speaker}")
-                                # Format speaker scores
-                                scores_str = ' | '.join(
-                                    f"{name}: {score:.2f}"
-                                    for name, score in scores.items()
-                                )
-                                print(f"📊 Confidence: {scores_str}")
-                                current_speaker = speaker
-                            
-                            # Update transcript in place
-                            self._clear_line()
-                            print(f"🗣️ {transcript}", end='', flush=True)
-                            
-                    except asyncio.TimeoutError:
-                        # No transcription received, but still log every second if needed
-                        if self._should_log():
-                            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            print(f"\n⏰ [{timestamp}] Listening...")
-                        continue
+                # Audio goes out and results come back concurrently
+                stop = asyncio.Event()
+                await stream_audio(websocket, self.recorder, self._receive_results(websocket, stop),
+                                   stop_event=stop, batch_frames=self.batch_frames)
                     
         except KeyboardInterrupt:
             print("\n\n🛑 Stopping transcription...")
@@ -124,6 +119,8 @@ Note: Make sure to enroll speakers first using eagle_enrollment_client.py
     
     client = TranscriptionClient(args.host, args.port, args.audio_device_index)
     
+    use_uvloop()
+    
     try:
         asyncio.run(client.start_transcription())
     except KeyboardInterrupt:
@@ -1,47 +1,55 @@
 import asyncio
-import json
 import websockets
 import numpy as np
 import pveagle
 import pvcheetah
 import os
-import struct
+import threading
 from typing import List, Dict
 from collections import deque
+from _compat import dumps, use_uvloop
+
+# Frames whose peak amplitude is below this skip Eagle
+SILENCE_THRESHOLD = 100
 
 class RealtimeTranscriptionServer:
     def __init__(self, access_key: str, profiles_dir: str):
         self.access_key = access_key
         self.profiles_dir = profiles_dir
         self.eagle = None
-        self.cheetah = None
         self.speaker_labels = []
         self.profiles = []
-        self.initialize_engines()
+        self.eagle_lock = threading.Lock()  # Eagle is shared by all connections' worker threads
         
         # Buffer settings optimized for Cheetah
         self.frame_length = None  # Will be set by Cheetah's requirements
+        self.initialize_engines()
 
-    def initialize_engines(self):
+    def create_cheetah(self):
         # Initialize Cheetah for real-time speech-to-text
-        self.cheetah = pvcheetah.create(
+        return pvcheetah.create(
             access_key=self.access_key,
             endpoint_duration_sec=0.5,  # Shorter endpoint duration for faster responses
             enable_automatic_punctuation=True
         )
-        self.frame_length = self.cheetah.frame_length
+
+    def initialize_engines(self):
+        # Each connection gets its own Cheetah; create one up front to check the key and read frame_length
+        cheetah = self.create_cheetah()
+        self.frame_length = cheetah.frame_length
+        cheetah.delete()
 
         # Load all speaker profiles from the profiles directory
         if not os.path.exists(self.profiles_dir):
             os.makedirs(self.profiles_dir)
             
-        for profile_file in os.listdir(self.profiles_dir):
-            if profile_file.endswith('.bin'):
-                profile_path = os.path.join(self.profiles_dir, profile_file)
-                self.speaker_labels.append(os.path.splitext(profile_file)[0])
-                with open(profile_path, 'rb') as f:
-                    profile = pveagle.EagleProfile.from_bytes(f.read())
-                self.profiles.append(profile)
+        with os.scandir(self.profiles_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.bin') and entry.is_file():
+                    self.speaker_labels.append(os.path.splitext(entry.name)[0])
+                    with open(entry.path, 'rb') as f:
+                        profile = pveagle.EagleProfile.from_bytes(f.read())
+                    self.profiles.append(profile)
 
         if self.profiles:
             self.eagle = pveagle.create_recognizer(
@@ -49,35 +57,64 @@ class RealtimeTranscriptionServer:
                 speaker_profiles=self.profiles
             )
 
+    def process_frames(self, cheetah, frames):
+        # Runs in a worker thread: the engines are native code and would otherwise block the event loop
+        speaker_scores = {}
+        most_likely_speaker = "Unknown"
+        transcript = ""
+        scores = None
+        for frame in frames:
+            # The engines copy input element by element, which is much cheaper from a list than from numpy scalars
+            samples = frame.tolist()
+            
+            # Process speaker identification with Eagle, skipping silent frames
+            # (peak amplitude, without allocating an abs() temporary)
+            if self.eagle and max(int(frame.max()), -int(frame.min())) >= SILENCE_THRESHOLD:
+                with self.eagle_lock:
+                    scores = self.eagle.process(samples)
+
+            # Process speech-to-text with Cheetah; it needs the silence to detect endpoints
+            partial_transcript, is_endpoint = cheetah.process(samples)
+            transcript += partial_transcript
+            
+            # If we hit an endpoint, get any remaining text
+            if is_endpoint:
+                remaining_text = cheetah.flush()
+                if remaining_text:
+                    transcript += " " + remaining_text
+        
+        # Eagle's scores are running estimates, so the last frame's are the current ones
+        if scores:
+            most_likely_speaker = self.speaker_labels[int(np.argmax(scores))]
+            speaker_scores = dict(zip(self.speaker_labels, scores))
+        
+        return speaker_scores, most_likely_speaker, transcript
+
     async def process_audio(self, websocket):
+        # Cheetah keeps decoder state between frames, so sharing one would mix transcripts across clients
+        cheetah = None
+        speaker_scores = {}
+        most_likely_speaker = "Unknown"
         try:
+            cheetah = await asyncio.to_thread(self.create_cheetah)
             while True:
                 # Receive audio data as bytes
                 audio_data = await websocket.recv()
                 
-                # Convert bytes to PCM data
-                pcm_data = list(struct.unpack('h' * (len(audio_data) // 2), audio_data))
+                # View bytes as 16-bit PCM without copying
+                pcm_data = np.frombuffer(audio_data, dtype=np.int16)
                 
-                # Process speaker identification with Eagle
-                speaker_scores = {}
-                most_likely_speaker = "Unknown"
-                if self.eagle and len(pcm_data) > 0:
-                    scores = self.eagle.process(pcm_data)
-                    speaker_scores = {
-                        label: float(score) 
-                        for label, score in zip(self.speaker_labels, scores)
-                    }
-                    if speaker_scores:
-                        most_likely_speaker = max(speaker_scores.items(), key=lambda x: x[1])[0]
-
-                # Process speech-to-text with Cheetah
-                transcript, is_endpoint = self.cheetah.process(pcm_data)
+                # A message may carry several frames; both engines take exactly frame_length samples
+                num_frames = pcm_data.size // self.frame_length
+                frames = pcm_data[:num_frames * self.frame_length].reshape(num_frames, self.frame_length)
                 
-                # If we hit an endpoint, get any remaining text
-                if is_endpoint:
-                    remaining_text = self.cheetah.flush()
-                    if remaining_text:
-                        transcript += " " + remaining_text
+                # One thread hop per message; connections run concurrently, each with its own Cheetah
+                scores, speaker, transcript = await asyncio.to_thread(
+                    self.process_frames, cheetah, frames
+                )
+                if scores:
+                    # Silent messages leave the last speaker estimate in place
+                    speaker_scores, most_likely_speaker = scores, speaker
                 
                 # Send back combined results
                 response = {
@@ -86,19 +123,19 @@ class RealtimeTranscriptionServer:
                     'transcript': transcript.strip()
                 }
                 
-                await websocket.send(json.dumps(response))
+                await websocket.send(dumps(response))
 
         except websockets.exceptions.ConnectionClosed:
             print("Client disconnected")
         except Exception as e:
             print(f"Error processing audio: {str(e)}")
             try:
-                await websocket.send(json.dumps({'error': str(e)}))
+                await websocket.send(dumps({'error': str(e)}))
             except:
                 pass
         finally:
-            if self.cheetah:
-                self.cheetah.delete()
+            if cheetah:
+                cheetah.delete()
 
     async def start_server(self, host: str = 'localhost', port: int = 6789):
         if not self.profiles:
@@ -110,8 +147,14 @@ class RealtimeTranscriptionServer:
         print(f"Using Cheetah frame length: {self.frame_length}")
         print("Processing audio in real-time with minimal latency")
         
-        async with websockets.serve(self.process_audio, host, port):
-            await asyncio.Future()  # run forever
+        # PCM audio doesn't deflate, so skip permessage-deflate; pings keep idle proxies from dropping us
+        try:
+            async with websockets.serve(self.process_audio, host, port, compression=None,
+                                        max_size=2**20, ping_interval=20, ping_timeout=20):
+                await asyncio.Future()  # run forever
+        finally:
+            if self.eagle:
+                self.eagle.delete()
 
 def main():
     import argparse
@@ -124,6 +167,9 @@ def main():
     args = parser.parse_args()
     
     server = RealtimeTranscriptionServer(args.access_key, args.profiles_dir)
+    
+    use_uvloop()
+    
     asyncio.run(server.start_server(args.host, args.port))
 
 if __name__ == "__main__":
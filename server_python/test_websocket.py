@@ -21,9 +21,12 @@ async def test_websocket_connection():
                 print(f"\nSending frame {i+1}")
                 await websocket.send(silent_frame)
                 
-                # Wait for response
-                response = await websocket.recv()
-                print(f"Response {i+1}:", response)
+                # /stream only replies when there is something new, and never for silence
+                try:
+                    response = await asyncio.wait_for(websocket.recv(), timeout=1.0)
+                    print(f"Response {i+1}:", response)
+                except asyncio.TimeoutError:
+                    print(f"No response to frame {i+1} (expected for silence)")
                 
                 # Small delay between frames
                 await asyncio.sleep(0.1)